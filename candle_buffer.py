@@ -0,0 +1,227 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from multiprocessing import resource_tracker, shared_memory
+
+COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+DEFAULT_CAPACITY = 1000
+HEADER_SIZE = 64
+MAX_READ_RETRIES = 100
+TIMEFRAME_MS = {
+    "1m": 60000, "5m": 300000, "15m": 900000, "30m": 1800000,
+    "1h": 3600000, "4h": 14400000, "1d": 86400000
+}
+
+# ترتیب فیلدهای هدر (int64)
+_SEQ, _COUNT, _CAPACITY, _BAR_MS, _WRITER_PID, _GAPS = 0, 1, 2, 3, 4, 5
+_HEADER_FIELDS = 8
+
+
+def buffer_name(symbol, timeframe):
+    return f"qai_candles_{symbol}_{timeframe}"
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # پایتون < 3.13: خواننده نباید حافظه را هنگام خروج unlink کند. اگر همین پروسه
+        # نویسنده است ثبت tracker مال خود نویسنده است و نباید حذف شود
+        shm = shared_memory.SharedMemory(name=name)
+        pid = int(np.frombuffer(shm.buf, dtype=np.int64, count=1, offset=_WRITER_PID * 8)[0])
+        if pid != os.getpid():
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        # روی ویندوز os.kill(pid, 0) پروسه را می‌بندد؛ محافظه‌کارانه زنده فرض می‌کنیم
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class CandleRing:
+    # بافر حلقوی با ظرفیت ثابت در shared memory: یک نویسنده و چند خواننده بدون قفل.
+    # هر کندل دو بار (در i و i + capacity) نوشته می‌شود تا آخرین n کندل همیشه
+    # یک برش پیوسته باشد و بدون کپی به DataFrame تبدیل شود.
+    # نویسنده قبل و بعد از هر نوشتن seq را یک واحد زیاد می‌کند (seqlock)؛
+    # seq فرد یعنی نوشتن در جریان است. pid نویسنده در هدر ثبت می‌شود تا نویسنده دوم رد شود.
+    def __init__(self, shm, writer):
+        self.shm = shm
+        self.writer = writer
+        self._write_lock = threading.Lock()
+        self.header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        self.capacity = int(self.header[_CAPACITY])
+        self.data = np.ndarray((2 * self.capacity, len(COLUMNS)), dtype=np.float64,
+                               buffer=shm.buf, offset=HEADER_SIZE)
+
+    @classmethod
+    def create(cls, symbol, timeframe, capacity=DEFAULT_CAPACITY):
+        name = buffer_name(symbol, timeframe)
+        size = HEADER_SIZE + 2 * capacity * len(COLUMNS) * 8
+        bar_ms = TIMEFRAME_MS.get(timeframe, 0)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # بافر به جا مانده فقط وقتی گرفته می‌شود که نویسنده قبلی دیگر زنده نباشد
+            probe = cls(_attach(name), writer=False)
+            pid = int(probe.header[_WRITER_PID])
+            existing_capacity = probe.capacity
+            probe.close()
+            if pid not in (0, os.getpid()) and _pid_alive(pid):
+                raise Exception(f"Candle buffer {name} already has a writer (pid {pid})")
+            # نویسنده جدید بافر را با ثبت در resource tracker باز می‌کند تا هنگام خروج پاک شود
+            shm = shared_memory.SharedMemory(name=name)
+            if existing_capacity == capacity:
+                ring = cls(shm, writer=True)
+                ring.header[_WRITER_PID] = os.getpid()
+                ring.header[_BAR_MS] = bar_ms
+                return ring
+            shm.close()
+            shm.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_CAPACITY] = capacity
+        header[_BAR_MS] = bar_ms
+        header[_WRITER_PID] = os.getpid()
+        del header
+        return cls(shm, writer=True)
+
+    @classmethod
+    def attach(cls, symbol, timeframe):
+        return cls(_attach(buffer_name(symbol, timeframe)), writer=False)
+
+    def __len__(self):
+        return min(int(self.header[_COUNT]), self.capacity)
+
+    @property
+    def seq(self):
+        return int(self.header[_SEQ])
+
+    @property
+    def gaps(self):
+        # تعداد دفعاتی که کندل‌های جاافتاده باعث شروع دوباره بافر شده‌اند
+        return int(self.header[_GAPS])
+
+    def last_timestamp(self):
+        count = int(self.header[_COUNT])
+        if count == 0:
+            return None
+        return int(self.data[(count - 1) % self.capacity, 0])
+
+    def write(self, df):
+        if not self.writer:
+            raise Exception("Candle buffer is read-only")
+        candles = df[COLUMNS].astype({"timestamp": "int64"}).to_numpy(dtype=np.float64)
+        with self._write_lock:
+            return self._write(candles)
+
+    def _write(self, candles):
+        last_ts = self.last_timestamp()
+        if last_ts is not None:
+            candles = candles[candles[:, 0] >= last_ts]
+        if len(candles) == 0:
+            return 0
+
+        count = int(self.header[_COUNT])
+        bar_ms = int(self.header[_BAR_MS])
+        self.header[_SEQ] += 1
+        if last_ts is not None and bar_ms > 0 and candles[0, 0] > last_ts + bar_ms:
+            # کندل‌های بین last_ts و داده جدید در دسترس نیستند؛ بافر از نو شروع می‌شود
+            # تا خواننده‌ها EMA و RSI را روی یک شکاف حساب نکنند
+            count = 0
+            self.header[_GAPS] += 1
+        for candle in candles:
+            # کندل باز فعلی (همان timestamp) جایگزین می‌شود، کندل جدید اضافه می‌شود
+            if count > 0 and candle[0] == self.data[(count - 1) % self.capacity, 0]:
+                slot = (count - 1) % self.capacity
+            else:
+                slot = count % self.capacity
+                count += 1
+            self.data[slot] = candle
+            self.data[slot + self.capacity] = candle
+        self.header[_COUNT] = count
+        self.header[_SEQ] += 1
+        return len(candles)
+
+    def _window(self, count, limit):
+        size = min(count, self.capacity)
+        if limit is not None:
+            size = min(size, limit)
+        start = (count - size) % self.capacity
+        # فقط‌خواندنی تا هیچ خواننده‌ای داده مشترک همه پروسه‌ها را خراب نکند
+        window = self.data[start:start + size]
+        window.setflags(write=False)
+        return window
+
+    def view(self, limit=None):
+        # DataFrame فقط‌خواندنی بدون کپی روی حافظه مشترک؛ معتبر فقط تا نوشتن بعدی،
+        # پس بعد از استفاده با changed_since(seq) بررسی و قبل از نگه داشتن کپی شود
+        seq = self.seq
+        count = int(self.header[_COUNT])
+        frame = pd.DataFrame(self._window(count, limit), columns=COLUMNS, copy=False)
+        return frame, seq
+
+    def changed_since(self, seq):
+        return seq % 2 == 1 or self.seq != seq
+
+    def consume(self, fn, limit=None):
+        # fn روی view بدون کپی اجرا می‌شود و اگر در این بین نوشتنی رخ داده باشد تکرار می‌شود.
+        # اگر fn فریم ورودی (یا فریمی با همان ستون‌ها) را برگرداند، پیش از بررسی seq کپی
+        # می‌شود تا نتیجه به حافظه مشترک اشاره نکند و با نوشتن بعدی عوض نشود
+        for _ in range(MAX_READ_RETRIES):
+            frame, seq = self.view(limit)
+            if seq % 2 == 1:
+                continue
+            result = fn(frame)
+            if isinstance(result, (pd.DataFrame, pd.Series)):
+                result = result.copy(deep=True)
+            del frame
+            if not self.changed_since(seq):
+                return result
+        raise Exception("Candle buffer is being written too frequently to read")
+
+    def snapshot(self, limit=None):
+        return self.consume(lambda frame: frame, limit)
+
+    def close(self):
+        if self.writer and self.header is not None and int(self.header[_WRITER_PID]) == os.getpid():
+            self.header[_WRITER_PID] = 0
+        self.header = None
+        self.data = None
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        if self.writer:
+            self.shm.unlink()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def publish_candles(df, symbol, timeframe, capacity=DEFAULT_CAPACITY):
+    key = (symbol, timeframe)
+    with _writers_lock:
+        if key not in _writers:
+            _writers[key] = CandleRing.create(symbol, timeframe, capacity)
+        ring = _writers[key]
+    return ring.write(df)
+
+
+def read_candles(symbol, timeframe, limit=None):
+    ring = CandleRing.attach(symbol, timeframe)
+    try:
+        return ring.snapshot(limit)
+    finally:
+        ring.close()
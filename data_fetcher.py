@@ -1,6 +1,8 @@
 import requests
 import pandas as pd
 
+DEFAULT_CANDLES = 100
+
 
 def get_price(symbol):
     url = f"https://www.okx.com/api/v5/market/ticker?instId={symbol}"
@@ -11,7 +13,7 @@ def get_price(symbol):
         raise Exception("Failed to get price")
 
 
-def get_ohlcv(symbol, timeframe, limit=100):
+def get_ohlcv(symbol, timeframe, limit=DEFAULT_CANDLES):
     url = f"https://www.okx.com/api/v5/market/candles?instId={symbol}&bar={timeframe}&limit={limit}"
     resp = requests.get(url).json()
     if "data" in resp:
@@ -30,3 +32,21 @@ def get_ohlcv(symbol, timeframe, limit=100):
         return df[["timestamp", "open", "high", "low", "close", "volume"]]
     else:
         raise Exception("Failed to get OHLCV data")
+
+
+def get_instruments(inst_type="SPOT"):
+    url = f"https://www.okx.com/api/v5/public/instruments?instType={inst_type}"
+    resp = requests.get(url).json()
+    if "data" in resp:
+        return [inst for inst in resp["data"] if inst.get("state") == "live"]
+    else:
+        raise Exception("Failed to get instruments")
+
+
+def get_tickers(inst_type="SPOT"):
+    url = f"https://www.okx.com/api/v5/market/tickers?instType={inst_type}"
+    resp = requests.get(url).json()
+    if "data" in resp:
+        return {ticker["instId"]: ticker for ticker in resp["data"]}
+    else:
+        raise Exception("Failed to get tickers")
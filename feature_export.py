@@ -0,0 +1,122 @@
+import os
+import tempfile
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+EXPORT_DIR = "exports"
+INDICATORS_DIR = os.path.join(EXPORT_DIR, "indicators")
+SIGNALS_DIR = os.path.join(EXPORT_DIR, "signals")
+LATEST_DIR = os.path.join(EXPORT_DIR, "latest")
+BACKFILL_MARKER = "_backfilled"
+
+_locks = {}
+_locks_lock = threading.Lock()
+_last_exported = {}
+
+
+def _partition_lock(path):
+    with _locks_lock:
+        if path not in _locks:
+            _locks[path] = threading.Lock()
+        return _locks[path]
+
+
+def _partition_path(root, symbol, timeframe, date):
+    return os.path.join(root, f"symbol={symbol}", f"timeframe={timeframe}", f"date={date}")
+
+
+def _write_atomic(table, path, writer):
+    # نام موقت یکتاست و با "." شروع می‌شود تا خواننده‌های dataset آن را نادیده بگیرند
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                    prefix="." + os.path.basename(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        writer(table, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _merge_partition(df, path, key):
+    # هر پارتیشن یک فایل دارد؛ ردیف‌های تکراری (مثلا کندل باز) با مقدار جدید جایگزین می‌شوند
+    # read-modify-write هر پارتیشن سریالی است تا ردیف‌های سشن‌های هم‌زمان گم نشوند
+    os.makedirs(path, exist_ok=True)
+    file_path = os.path.join(path, "part-0.parquet")
+    with _partition_lock(file_path):
+        if os.path.exists(file_path):
+            df = pd.concat([pd.read_parquet(file_path), df], ignore_index=True)
+        df = df.drop_duplicates(subset=key, keep="last").sort_values(key)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        _write_atomic(table, file_path, pq.write_table)
+    return file_path
+
+
+def export_indicators(df, symbol, timeframe, root=INDICATORS_DIR):
+    # فقط کندل‌های از آخرین timestamp صادرشده به بعد ادغام می‌شوند (کندل باز + کندل‌های جدید)،
+    # پس در حالت عادی هر به‌روزرسانی فقط یک پارتیشن را بازنویسی می‌کند
+    key = (root, symbol, timeframe)
+    timestamps = df["timestamp"].astype("int64")
+    last = _last_exported.get(key)
+    if last is not None:
+        df = df[timestamps >= last]
+        timestamps = timestamps[timestamps >= last]
+    if df.empty:
+        return []
+    dates = pd.to_datetime(timestamps, unit="ms").dt.strftime("%Y-%m-%d")
+    paths = []
+    for date, part in df.groupby(dates):
+        path = _partition_path(root, symbol, timeframe, date)
+        paths.append(_merge_partition(part, path, "timestamp"))
+    _last_exported[key] = int(timestamps.max())
+    return paths
+
+
+def export_signals(logs, root=SIGNALS_DIR):
+    df_logs = pd.DataFrame(logs)
+    if df_logs.empty:
+        return []
+    dates = pd.to_datetime(df_logs["timestamp"]).dt.strftime("%Y-%m-%d")
+    paths = []
+    for (symbol, timeframe, date), part in df_logs.groupby([df_logs["symbol"], df_logs["timeframe"], dates]):
+        path = _partition_path(root, symbol, timeframe, date)
+        part = part.drop(columns=["symbol", "timeframe"])
+        paths.append(_merge_partition(part, path, "timestamp"))
+    return paths
+
+
+def backfill_signals(logs, root=SIGNALS_DIR):
+    # یک بار کل signals_history.json موجود را صادر می‌کند؛ export_signals بعد از آن فقط ورودی‌های جدید را می‌گیرد
+    marker = os.path.join(root, BACKFILL_MARKER)
+    if os.path.exists(marker):
+        return []
+    paths = export_signals(logs, root)
+    os.makedirs(root, exist_ok=True)
+    open(marker, "w").close()
+    return paths
+
+
+def load_dataset(root):
+    # ستون‌های symbol/timeframe/date از مسیر پارتیشن (hive) خوانده می‌شوند
+    return pd.read_parquet(root)
+
+
+def latest_path(symbol, timeframe, root=LATEST_DIR):
+    return os.path.join(root, f"{symbol}_{timeframe}.arrow")
+
+
+def write_latest(df, symbol, timeframe, root=LATEST_DIR):
+    # فایل IPC بدون فشرده‌سازی تا خواننده‌ها بتوانند بدون کپی memory-map کنند
+    os.makedirs(root, exist_ok=True)
+    path = latest_path(symbol, timeframe, root)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    _write_atomic(table, path,
+                  lambda t, p: feather.write_feather(t, p, compression="uncompressed"))
+    return path
+
+
+def read_latest(symbol, timeframe, root=LATEST_DIR):
+    return feather.read_table(latest_path(symbol, timeframe, root), memory_map=True)
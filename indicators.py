@@ -2,7 +2,8 @@ import pandas as pd
 import numpy as np
 
 
-def calculate_indicators(df):
+def calculate_core_indicators(df):
+    # اندیکاتورهای سبکی که generate_signal، analyze_trend و detect_pullbacks استفاده می‌کنند
     # EMA
     df["ema20"] = df["close"].ewm(span=20, adjust=False).mean()
     df["ema50"] = df["close"].ewm(span=50, adjust=False).mean()
@@ -31,6 +32,19 @@ def calculate_indicators(df):
     mfr = positive_flow / negative_flow
     df["mfi"] = 100 - (100 / (1 + mfr))
 
+    # Bollinger Bands
+    df["bb_mid"] = df["close"].rolling(window=20).mean()
+    df["bb_std"] = df["close"].rolling(window=20).std()
+    df["bb_high"] = df["bb_mid"] + 2 * df["bb_std"]
+    df["bb_low"] = df["bb_mid"] - 2 * df["bb_std"]
+
+    return df
+
+
+def calculate_indicators(df):
+    df = calculate_core_indicators(df)
+    typical_price = (df["high"] + df["low"] + df["close"]) / 3
+
     # ADX (simple version)
     high = df["high"]
     low = df["low"]
@@ -55,12 +69,6 @@ def calculate_indicators(df):
     dx = 100 * (abs(plus_di - minus_di) / (plus_di + minus_di))
     df["adx"] = dx.rolling(14).mean()
 
-    # Bollinger Bands
-    df["bb_mid"] = df["close"].rolling(window=20).mean()
-    df["bb_std"] = df["close"].rolling(window=20).std()
-    df["bb_high"] = df["bb_mid"] + 2 * df["bb_std"]
-    df["bb_low"] = df["bb_mid"] - 2 * df["bb_std"]
-
     # Stochastic %K and %D
     low_14 = low.rolling(14).min()
     high_14 = high.rolling(14).max()
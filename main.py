@@ -3,15 +3,47 @@ import json
 import os
 from datetime import datetime
 import pandas as pd
-from data_fetcher import get_ohlcv, get_price
-from indicators import calculate_indicators
 from patterns import detect_patterns_and_pullbacks
 from trend_analysis import analyze_trend
 from signal_generator import generate_signal
+from feature_export import backfill_signals, export_indicators, export_signals, write_latest
+from market_hub import MarketDataHub
+from candle_buffer import publish_candles
+from risk_engine import analyze_risk
+from screener import MAX_TOP_K, scan_market
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 LOG_FILE = "signals_history.json"
 
 
+def export_frame(df, symbol, timeframe):
+    write_latest(df, symbol, timeframe)
+    export_indicators(df, symbol, timeframe)
+    publish_candles(df, symbol, timeframe)
+
+
+@st.cache_resource
+def get_market_hub():
+    return MarketDataHub(on_refresh=export_frame)
+
+
+@st.cache_resource
+def backfill_signal_exports():
+    return backfill_signals(load_logs())
+
+
+@st.cache_data(max_entries=256)
+def get_risk_analysis(_df, symbol, timeframe, generation, leverage, stop_loss_pct, take_profit_pct, side):
+    # هر فریم فقط یک بار شبیه‌سازی می‌شود؛ generation در کل هاب برای هر فریم یکتاست
+    return analyze_risk(_df, leverage, stop_loss_pct, take_profit_pct, side=side)
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_market_scan(timeframe):
+    # یک اسکن در هر دقیقه بین همه سشن‌ها مشترک است؛ با بیشترین K اجرا و برای هر سشن برش زده می‌شود
+    return scan_market(timeframe, MAX_TOP_K)
+
+
 def load_logs():
     if os.path.exists(LOG_FILE):
         with open(LOG_FILE, "r") as f:
@@ -27,7 +59,7 @@ def save_log(log_data):
 
 
 # Professional Trading UI Styling
-st.markdown("""
+APP_STYLE = """
 <style>
 :root {
     --primary: #2563eb;
@@ -215,51 +247,16 @@ h4 {
     color: var(--primary);
 }
 </style>
-""", unsafe_allow_html=True)
+"""
 
-# App Layout
-st.title("Quantum AI Trading Advisor")
-st.markdown("""
-<div class="custom-card" style="border-left: 4px solid var(--primary); padding: 1rem;">
-    <p style="margin: 0; color: var(--text-medium); font-size: 0.9rem;">
-    Advanced algorithmic trading system powered by quantum-inspired AI
-    </p>
-</div>
-""", unsafe_allow_html=True)
-
-# Sidebar with professional design
-with st.sidebar:
-    st.markdown("""
-    <div class="custom-card" style="padding: 1rem;">
-        <h3 style="margin-top: 0; font-size: 1.1rem;">Trading Parameters</h3>
-    </div>
-    """, unsafe_allow_html=True)
 
-    # Expanded cryptocurrency list
-    symbols = [
-        "BTC-USDT", "ETH-USDT", "BNB-USDT", "SOL-USDT",
-        "XRP-USDT", "ADA-USDT", "DOGE-USDT", "DOT-USDT",
-        "MATIC-USDT", "AVAX-USDT", "LINK-USDT", "ATOM-USDT"
-    ]
-    symbol = st.selectbox("Trading Pair", symbols)
-    timeframe = st.selectbox(
-        "Timeframe", ["1m", "5m", "15m", "30m", "1h", "4h", "1d"])
-    capital = st.number_input(
-        "Capital (USDT)", min_value=10.0, value=5000.0, step=100.0)
-    leverage = st.slider("Leverage", 1, 100, 10)
-
-    st.markdown("""
-    <div style="margin-top: 1.5rem; text-align: center;">
-        <small style="color: var(--text-medium); font-size: 0.75rem;">Quantum AI v3.1</small>
-    </div>
-    """, unsafe_allow_html=True)
-
-# Main content
-if st.button("Run Quantum Analysis", use_container_width=True):
+def render_analysis(symbol, timeframe, capital, leverage, refresh_interval):
+    # فقط اجرای دستی ثبت می‌شود، نه به‌روزرسانی‌های خودکار؛ پرچم حتی اگر تحلیل شکست بخورد مصرف می‌شود
+    log_pending = st.session_state.pop("log_pending", False)
     try:
-        price = get_price(symbol)
-        df = get_ohlcv(symbol, timeframe)
-        df = calculate_indicators(df)
+        hub = get_market_hub()
+        hub.subscribe(get_script_run_ctx().session_id, symbol, timeframe)
+        price, df, feed_stats = hub.get(symbol, timeframe, max_age=refresh_interval)
         patterns, pullbacks = detect_patterns_and_pullbacks(df)
         trend_info = analyze_trend(df)
 
@@ -273,6 +270,10 @@ if st.button("Run Quantum Analysis", use_container_width=True):
             stop_loss_pct=0.01,
             take_profit_pct=0.015,
         )
+        risk = get_risk_analysis(
+            df, symbol, timeframe, feed_stats["generation"], leverage, 0.01, 0.015,
+            "long" if signal["recommendation"] == "Buy" else "short")
+        signal["risk_analysis"] = risk
 
         log_entry = {
             "timestamp": datetime.utcnow().isoformat(),
@@ -289,9 +290,13 @@ if st.button("Run Quantum Analysis", use_container_width=True):
             "leverage": leverage,
             "capital": capital,
             "prediction_accuracy": signal.get("prediction_accuracy", "N/A"),
-            "market_trend": trend_info.get("trend", "N/A")
+            "market_trend": trend_info.get("trend", "N/A"),
+            "mc_recommended_leverage": risk["recommended_leverage"],
+            "risk_of_ruin": risk["selected"]["risk_of_ruin"]
         }
-        save_log(log_entry)
+        if log_pending:
+            save_log(log_entry)
+            export_signals([log_entry])
 
         # Results display
         st.markdown(f"""
@@ -301,6 +306,7 @@ if st.button("Run Quantum Analysis", use_container_width=True):
                 <div style="text-align: right;">
                     <div style="color: var(--text-medium); font-size: 0.8rem;">Current Price</div>
                     <div class="price-display">{price:.2f} USDT</div>
+                    <div style="color: var(--text-medium); font-size: 0.75rem;">{feed_stats['subscribers']} viewers · refresh {feed_stats['refresh_latency_ms']} ms</div>
                 </div>
             </div>
         </div>
@@ -417,105 +423,238 @@ if st.button("Run Quantum Analysis", use_container_width=True):
                 pullbacks
             ), unsafe_allow_html=True)
 
-        # Divider
-        st.markdown('<hr class="custom-divider">', unsafe_allow_html=True)
+        selected_risk = risk["selected"]
+        st.markdown(f"""
+        <div class="custom-card">
+            <h3 style="margin-top: 0; font-size: 1.1rem;">Monte Carlo Risk · {risk['side'].capitalize()} ({risk['n_paths']} paths, {risk['horizon']} candles)</h3>
+            <div class="grid-container">
+                <div class="grid-item">
+                    <div class="metric-label">Recommended Leverage</div>
+                    <div class="metric-value">{f"{risk['recommended_leverage']}x" if risk['recommended_leverage'] is not None else "No safe leverage"}</div>
+                </div>
+                <div class="grid-item">
+                    <div class="metric-label">Liquidation Risk @ {leverage}x</div>
+                    <div class="metric-value">{selected_risk['liquidation_prob']*100:.2f}%</div>
+                </div>
+                <div class="grid-item">
+                    <div class="metric-label">Risk of Ruin @ {leverage}x</div>
+                    <div class="metric-value">{selected_risk['risk_of_ruin']*100:.2f}%</div>
+                </div>
+                <div class="grid-item">
+                    <div class="metric-label">VaR 95% @ {leverage}x</div>
+                    <div class="metric-value">{selected_risk['var_95']*100:.2f}%</div>
+                    <div class="metric-label">of capital</div>
+                </div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+    except Exception as e:
+        st.error(f"Quantum analysis failed: {str(e)}")
+        st.markdown("""
+        <div class="custom-card">
+            <p style="color: var(--danger); font-weight: 500; font-size: 0.9rem;">
+            Quantum analysis engine encountered an error. Please check your connection and try again.
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+@st.fragment
+def render_history():
+    # تاریخچه فقط وقتی باز شود از فایل خوانده و رندر می‌شود
+    view = st.segmented_control(
+        "History", ["Signal History", "Performance Metrics"], key="history_view")
+    if view is None:
+        return
+    logs = load_logs()
+
+    if view == "Signal History":
+        st.subheader("Signal History")
+        if not logs:
+            st.markdown("""
+            <div class="custom-card" style="text-align: center; padding: 1rem;">
+                <p style="color: var(--text-medium); font-size: 0.9rem;">No signals recorded yet</p>
+            </div>
+            """, unsafe_allow_html=True)
+        else:
+            df_logs = pd.DataFrame(logs)
+            df_logs["timestamp"] = pd.to_datetime(
+                df_logs["timestamp"]).dt.tz_localize(None)
+
+            # Apply color formatting
+            def color_signal(val):
+                color = '#10b981' if val.lower() == 'buy' else '#ef4444'
+                return f'color: {color}; font-weight: 500;'
+
+            styled_df = df_logs.sort_values(by="timestamp", ascending=False).style.applymap(
+                color_signal, subset=['signal'])
+
+            st.dataframe(
+                styled_df,
+                use_container_width=True,
+                column_config={
+                    "timestamp": "Time",
+                    "symbol": "Pair",
+                    "signal": "Signal",
+                    "price": "Price",
+                    "leverage": "Leverage"
+                },
+                hide_index=True
+            )
+
+    elif view == "Performance Metrics":
+        st.subheader("Performance Metrics")
+        if not logs:
+            st.markdown("""
+            <div class="custom-card" style="text-align: center; padding: 1rem;">
+                <p style="color: var(--text-medium); font-size: 0.9rem;">No performance data available yet</p>
+            </div>
+            """, unsafe_allow_html=True)
+        else:
+            df_logs = pd.DataFrame(logs)
+            if not df_logs.empty:
+                cols = st.columns(4)
+                metrics = [
+                    ("Total Signals", len(df_logs), ""),
+                    ("Buy Signals", len(
+                        df_logs[df_logs['signal'].str.lower() == 'buy']), "buy-badge"),
+                    ("Sell Signals", len(
+                        df_logs[df_logs['signal'].str.lower() == 'sell']), "sell-badge"),
+                    ("Avg Leverage",
+                     f"{df_logs['leverage'].mean():.1f}x", "")
+                ]
+
+                for col, (label, value, badge_class) in zip(cols, metrics):
+                    with col:
+                        st.markdown(f"""
+                        <div class="custom-card" style="text-align: center; padding: 0.8rem;">
+                            <div class="metric-label">{label}</div>
+                            <div style="font-size: 1.3rem; font-weight: 600; margin: 0.3rem 0; color: var(--{'accent' if badge_class == 'buy-badge' else 'danger' if badge_class == 'sell-badge' else 'primary'});">
+                                {value}
+                            </div>
+                            {f'<span class="status-badge {badge_class}" style="display: inline-block; margin-top: 0.2rem;">{label.split()[0].upper()}</span>' if badge_class else ''}
+                        </div>
+                        """, unsafe_allow_html=True)
 
-        # Logs section with tabs
-        tab1, tab2 = st.tabs(["Signal History", "Performance Metrics"])
+                st.markdown('<hr class="custom-divider">',
+                            unsafe_allow_html=True)
 
-        with tab1:
-            st.subheader("Signal History")
-            logs = load_logs()
-            if not logs:
                 st.markdown("""
-                <div class="custom-card" style="text-align: center; padding: 1rem;">
-                    <p style="color: var(--text-medium); font-size: 0.9rem;">No signals recorded yet</p>
+                <div class="custom-card">
+                    <h4 style="margin-top: 0;">Advanced Analytics</h4>
+                    <div style="color: var(--text-medium); font-size: 0.9rem;">
+                        Quantum AI is analyzing your trading patterns...
+                    </div>
                 </div>
                 """, unsafe_allow_html=True)
             else:
-                df_logs = pd.DataFrame(logs)
-                df_logs["timestamp"] = pd.to_datetime(
-                    df_logs["timestamp"]).dt.tz_localize(None)
-
-                # Apply color formatting
-                def color_signal(val):
-                    color = '#10b981' if val.lower() == 'buy' else '#ef4444'
-                    return f'color: {color}; font-weight: 500;'
+                st.markdown("""
+                <div class="custom-card" style="text-align: center; padding: 1rem;">
+                    <p style="color: var(--text-medium); font-size: 0.9rem;">No performance data available yet</p>
+                </div>
+                """, unsafe_allow_html=True)
 
-                styled_df = df_logs.sort_values(by="timestamp", ascending=False).style.applymap(
-                    color_signal, subset=['signal'])
 
+@st.fragment
+def render_screener(timeframe):
+    st.subheader("Market Screener")
+    top_k = st.number_input("Top Pairs", min_value=1, max_value=MAX_TOP_K, value=10, step=1)
+    if st.button("Scan All OKX USDT Pairs", use_container_width=True):
+        try:
+            with st.spinner("Scanning the market..."):
+                scan = get_market_scan(timeframe)
+            stats = scan["stats"]
+            results = scan["results"][:top_k]
+            if not results:
+                st.markdown("""
+                <div class="custom-card" style="text-align: center; padding: 1rem;">
+                    <p style="color: var(--text-medium); font-size: 0.9rem;">No pairs passed the screener</p>
+                </div>
+                """, unsafe_allow_html=True)
+            else:
                 st.dataframe(
-                    styled_df,
+                    pd.DataFrame(results),
                     use_container_width=True,
                     column_config={
-                        "timestamp": "Time",
                         "symbol": "Pair",
-                        "signal": "Signal",
-                        "price": "Price",
-                        "leverage": "Leverage"
+                        "score": "Score",
+                        "recommendation": "Signal",
+                        "quote_volume_24h": "24h Volume (USDT)"
                     },
                     hide_index=True
                 )
+            st.caption(
+                f"{stats['instruments']} pairs · {stats['liquid']} liquid · "
+                f"{stats['full_indicators']} fully analyzed · {stats['failed']} failed · {stats['elapsed_s']} s")
+        except Exception as e:
+            st.error(f"Market scan failed: {str(e)}")
 
-        with tab2:
-            st.subheader("Performance Metrics")
-            if not logs:
-                st.markdown("""
-                <div class="custom-card" style="text-align: center; padding: 1rem;">
-                    <p style="color: var(--text-medium); font-size: 0.9rem;">No performance data available yet</p>
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                df_logs = pd.DataFrame(logs)
-                if not df_logs.empty:
-                    cols = st.columns(4)
-                    metrics = [
-                        ("Total Signals", len(df_logs), ""),
-                        ("Buy Signals", len(
-                            df_logs[df_logs['signal'].str.lower() == 'buy']), "buy-badge"),
-                        ("Sell Signals", len(
-                            df_logs[df_logs['signal'].str.lower() == 'sell']), "sell-badge"),
-                        ("Avg Leverage",
-                         f"{df_logs['leverage'].mean():.1f}x", "")
-                    ]
-
-                    for col, (label, value, badge_class) in zip(cols, metrics):
-                        with col:
-                            st.markdown(f"""
-                            <div class="custom-card" style="text-align: center; padding: 0.8rem;">
-                                <div class="metric-label">{label}</div>
-                                <div style="font-size: 1.3rem; font-weight: 600; margin: 0.3rem 0; color: var(--{'accent' if badge_class == 'buy-badge' else 'danger' if badge_class == 'sell-badge' else 'primary'});">
-                                    {value}
-                                </div>
-                                {f'<span class="status-badge {badge_class}" style="display: inline-block; margin-top: 0.2rem;">{label.split()[0].upper()}</span>' if badge_class else ''}
-                            </div>
-                            """, unsafe_allow_html=True)
 
-                    st.markdown('<hr class="custom-divider">',
-                                unsafe_allow_html=True)
+# Static styling; fragment reruns do not re-emit it
+st.markdown(APP_STYLE, unsafe_allow_html=True)
 
-                    st.markdown("""
-                    <div class="custom-card">
-                        <h4 style="margin-top: 0;">Advanced Analytics</h4>
-                        <div style="color: var(--text-medium); font-size: 0.9rem;">
-                            Quantum AI is analyzing your trading patterns...
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown("""
-                    <div class="custom-card" style="text-align: center; padding: 1rem;">
-                        <p style="color: var(--text-medium); font-size: 0.9rem;">No performance data available yet</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+# App Layout
+st.title("Quantum AI Trading Advisor")
+st.markdown("""
+<div class="custom-card" style="border-left: 4px solid var(--primary); padding: 1rem;">
+    <p style="margin: 0; color: var(--text-medium); font-size: 0.9rem;">
+    Advanced algorithmic trading system powered by quantum-inspired AI
+    </p>
+</div>
+""", unsafe_allow_html=True)
 
-    except Exception as e:
-        st.error(f"Quantum analysis failed: {str(e)}")
-        st.markdown("""
-        <div class="custom-card">
-            <p style="color: var(--danger); font-weight: 500; font-size: 0.9rem;">
-            Quantum analysis engine encountered an error. Please check your connection and try again.
-            </p>
-        </div>
-        """, unsafe_allow_html=True)
+# Sidebar with professional design
+with st.sidebar:
+    st.markdown("""
+    <div class="custom-card" style="padding: 1rem;">
+        <h3 style="margin-top: 0; font-size: 1.1rem;">Trading Parameters</h3>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Expanded cryptocurrency list
+    symbols = [
+        "BTC-USDT", "ETH-USDT", "BNB-USDT", "SOL-USDT",
+        "XRP-USDT", "ADA-USDT", "DOGE-USDT", "DOT-USDT",
+        "MATIC-USDT", "AVAX-USDT", "LINK-USDT", "ATOM-USDT"
+    ]
+    symbol = st.selectbox("Trading Pair", symbols)
+    timeframe = st.selectbox(
+        "Timeframe", ["1m", "5m", "15m", "30m", "1h", "4h", "1d"])
+    capital = st.number_input(
+        "Capital (USDT)", min_value=10.0, value=5000.0, step=100.0)
+    leverage = st.slider("Leverage", 1, 100, 10)
+    live_monitoring = st.toggle("Live Monitoring", value=True)
+    refresh_interval = st.number_input(
+        "Refresh Interval (s)", min_value=1, value=1, step=1)
+
+    st.markdown("""
+    <div style="margin-top: 1.5rem; text-align: center;">
+        <small style="color: var(--text-medium); font-size: 0.75rem;">Quantum AI v3.1</small>
+    </div>
+    """, unsafe_allow_html=True)
+
+# Main content
+try:
+    backfill_signal_exports()
+except Exception as e:
+    st.warning(f"Signal export backfill failed: {str(e)}")
+
+if st.button("Run Quantum Analysis", use_container_width=True):
+    st.session_state["analysis_params"] = (symbol, timeframe, capital, leverage)
+    st.session_state["log_pending"] = True
+
+if "analysis_params" in st.session_state:
+    # فقط این بخش در هر بازه دوباره اجرا می‌شود، نه کل اسکریپت
+    live_analysis = st.fragment(
+        render_analysis, run_every=refresh_interval if live_monitoring else None)
+    live_analysis(*st.session_state["analysis_params"], refresh_interval)
+
+# Divider
+st.markdown('<hr class="custom-divider">', unsafe_allow_html=True)
+
+render_history()
+
+# Divider
+st.markdown('<hr class="custom-divider">', unsafe_allow_html=True)
+
+render_screener(timeframe)
@@ -0,0 +1,141 @@
+import itertools
+import logging
+import threading
+import time
+from data_fetcher import get_ohlcv, get_price
+from indicators import calculate_indicators
+
+REFRESH_INTERVAL = 5
+SUBSCRIBER_TTL = 120
+
+logger = logging.getLogger(__name__)
+
+
+class _Feed:
+    def __init__(self, symbol, timeframe):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.lock = threading.Lock()
+        self.export_lock = threading.Lock()
+        self.subscribers = {}
+        self.price = None
+        self.df = None
+        self.refreshed_at = 0.0
+        self.refresh_latency = None
+        self.refresh_count = 0
+        self.generation = 0
+        self.error = None
+        self.failed_at = 0.0
+
+
+class MarketDataHub:
+    # یک نمونه در هر پروسه: هر (symbol, timeframe) در هر بازه فقط یک بار از OKX
+    # گرفته و محاسبه می‌شود و فریم اندیکاتورها بین همه سشن‌ها به اشتراک گذاشته می‌شود.
+    # فریم برگشتی مشترک است و نباید تغییر داده شود.
+    def __init__(self, refresh_interval=REFRESH_INTERVAL, subscriber_ttl=SUBSCRIBER_TTL, on_refresh=None):
+        self.refresh_interval = refresh_interval
+        self.subscriber_ttl = subscriber_ttl
+        self.on_refresh = on_refresh
+        self._lock = threading.Lock()
+        self._feeds = {}
+        # شماره یکتای هر فریم در کل هاب؛ با حذف و ساخت دوباره feed از صفر شروع نمی‌شود
+        self._generations = itertools.count(1)
+
+    def _feed_locked(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        if key not in self._feeds:
+            self._feeds[key] = _Feed(symbol, timeframe)
+        return self._feeds[key]
+
+    def _feed(self, symbol, timeframe):
+        with self._lock:
+            return self._feed_locked(symbol, timeframe)
+
+    def subscribe(self, session_id, symbol, timeframe):
+        now = time.monotonic()
+        key = (symbol, timeframe)
+        with self._lock:
+            for other_key, feed in list(self._feeds.items()):
+                if other_key != key:
+                    feed.subscribers.pop(session_id, None)
+                    self._expire(feed, now)
+                    if not feed.subscribers:
+                        del self._feeds[other_key]
+            self._feed_locked(symbol, timeframe).subscribers[session_id] = now
+
+    def unsubscribe(self, session_id):
+        with self._lock:
+            for feed in self._feeds.values():
+                feed.subscribers.pop(session_id, None)
+
+    def _expire(self, feed, now):
+        for session_id, last_seen in list(feed.subscribers.items()):
+            if now - last_seen > self.subscriber_ttl:
+                feed.subscribers.pop(session_id, None)
+
+    def _refresh(self, feed):
+        started = time.perf_counter()
+        price = get_price(feed.symbol)
+        df = calculate_indicators(get_ohlcv(feed.symbol, feed.timeframe))
+        feed.price = price
+        feed.df = df
+        feed.refreshed_at = time.monotonic()
+        feed.refresh_latency = time.perf_counter() - started
+        feed.refresh_count += 1
+        feed.generation = next(self._generations)
+
+    def _export(self, feed, df):
+        # خروجی‌ها بیرون از قفل داده اجرا می‌شوند تا خواننده‌ها منتظر دیسک نمانند؛
+        # export_lock فقط خروجی‌های همین جفت را سریالی می‌کند (بافر مشترک یک نویسنده دارد)
+        with feed.export_lock:
+            try:
+                self.on_refresh(df, feed.symbol, feed.timeframe)
+            except Exception:
+                logger.exception("Export failed for %s %s", feed.symbol, feed.timeframe)
+
+    def get(self, symbol, timeframe, max_age=None):
+        # max_age: بیشترین عمر قابل قبول داده برای این درخواست (پیش‌فرض refresh_interval)
+        if max_age is None:
+            max_age = self.refresh_interval
+        feed = self._feed(symbol, timeframe)
+        refreshed = False
+        # single-flight: اولین درخواست داده را تازه می‌کند و بقیه منتظر همان نتیجه می‌مانند
+        with feed.lock:
+            now = time.monotonic()
+            if feed.df is None or now - feed.refreshed_at >= max_age:
+                # خطای اخیر (مثلا قطعی یا 429 از OKX) تا پایان همان بازه به همه برگردانده می‌شود
+                # تا هر بیننده جداگانه دوباره درخواست نفرستد
+                if feed.error is not None and now - feed.failed_at < max_age:
+                    raise feed.error
+                try:
+                    self._refresh(feed)
+                except Exception as e:
+                    feed.error = e
+                    feed.failed_at = time.monotonic()
+                    raise
+                feed.error = None
+                refreshed = True
+            price, df = feed.price, feed.df
+            stats = self._feed_row(feed, time.monotonic())
+        if refreshed and self.on_refresh is not None:
+            self._export(feed, df)
+        return price, df, stats
+
+    def _feed_row(self, feed, now):
+        self._expire(feed, now)
+        return {
+            "symbol": feed.symbol,
+            "timeframe": feed.timeframe,
+            "subscribers": len(feed.subscribers),
+            "refresh_count": feed.refresh_count,
+            "generation": feed.generation,
+            "last_error": None if feed.error is None else str(feed.error),
+            "refresh_latency_ms": None if feed.refresh_latency is None else round(feed.refresh_latency * 1000, 1),
+            "age_s": None if feed.df is None else round(now - feed.refreshed_at, 1),
+        }
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            feeds = list(self._feeds.values())
+        return [self._feed_row(feed, now) for feed in feeds]
@@ -0,0 +1,121 @@
+import numpy as np
+
+LEVERAGE_GRID = [1, 2, 3, 5, 10, 15, 20, 25, 30, 40, 50, 75, 100]
+N_PATHS = 20000
+HORIZON = 50
+MAINTENANCE_MARGIN = 0.005
+N_TRADES = 50
+RUIN_THRESHOLD = 0.5
+MAX_RISK_OF_RUIN = 0.01
+MAX_LIQUIDATION_PROB = 0.01
+
+
+def _candle_returns(df):
+    # بازده لگاریتمی close و فاصله low/high هر کندل نسبت به close قبلی
+    close = df["close"].to_numpy(dtype=np.float64)
+    prev_close = close[:-1]
+    ret = np.log(close[1:] / prev_close)
+    low = np.log(df["low"].to_numpy(dtype=np.float64)[1:] / prev_close)
+    high = np.log(df["high"].to_numpy(dtype=np.float64)[1:] / prev_close)
+    return ret, low, high
+
+
+def _first_hit(running, levels, below):
+    # running در طول زمان یکنواخت است، پس اولین برخورد = تعداد گام‌های قبل از عبور از سطح
+    if below:
+        return np.sum(running[None, :, :] > levels[:, None, None], axis=2)
+    return np.sum(running[None, :, :] < levels[:, None, None], axis=2)
+
+
+def simulate_trade_outcomes(df, leverages, stop_loss_pct=0.01, take_profit_pct=0.015,
+                            n_paths=N_PATHS, horizon=HORIZON, seed=None, side="long"):
+    ret, low, high = _candle_returns(df)
+    if len(ret) < 2:
+        raise Exception("Not enough candles for risk analysis")
+    if side == "short":
+        # پوزیشن short قرینه long است: بازده منفی می‌شود و low/high جابجا می‌شوند
+        ret, low, high = -ret, -high, -low
+    rng = np.random.default_rng(seed)
+    leverages = np.asarray(leverages, dtype=np.float64)
+
+    idx = rng.integers(0, len(ret), size=(n_paths, horizon))
+    sampled = ret[idx]
+    cum = np.cumsum(sampled, axis=1)
+    prev = cum - sampled
+    running_low = np.minimum.accumulate(prev + low[idx], axis=1)
+    running_high = np.maximum.accumulate(prev + high[idx], axis=1)
+
+    # سطوح در فضای لگاریتمی همان مسیر قرینه‌شده (برای short: قیمت بالا رفتن = حرکت منفی)
+    liq_move = np.clip(1 / leverages - MAINTENANCE_MARGIN, 1e-9, 1 - 1e-9)
+    if side == "short":
+        stop_level = -np.log(1 + stop_loss_pct)
+        tp_level = -np.log(1 - take_profit_pct)
+        liq_level = -np.log(1 + liq_move)
+        final_return = -np.expm1(-cum[:, -1])
+    else:
+        stop_level = np.log(1 - stop_loss_pct)
+        tp_level = np.log(1 + take_profit_pct)
+        liq_level = np.log(1 - liq_move)
+        final_return = np.expm1(cum[:, -1])
+    liquidates = liq_level >= stop_level
+    down_level = np.where(liquidates, liq_level, stop_level)
+
+    down_hit = _first_hit(running_low, down_level, below=True)
+    tp_hit = _first_hit(running_high, np.array([tp_level]), below=False)[0]
+
+    # اگر هر دو در یک کندل رخ دهند، بدبینانه فرض می‌کنیم ضرر اول رخ داده است
+    down_first = (down_hit < horizon) & (down_hit <= tp_hit[None, :])
+    tp_first = (tp_hit[None, :] < horizon) & ~down_first
+    liquidated = down_first & liquidates[:, None]
+    stopped = down_first & ~liquidates[:, None]
+
+    lev = leverages[:, None]
+    open_pnl = np.maximum(lev * final_return[None, :], -1.0)
+    pnl = np.where(tp_first, lev * take_profit_pct, open_pnl)
+    pnl = np.where(stopped, -lev * stop_loss_pct, pnl)
+    pnl = np.where(liquidated, -1.0, pnl)
+    return pnl, liquidated, stopped, tp_first
+
+
+def risk_of_ruin(pnl, n_trades=N_TRADES, ruin_threshold=RUIN_THRESHOLD, seed=None):
+    # n_trades معامله پشت سر هم با کل سرمایه؛ ruin یعنی افت سرمایه بیش از ruin_threshold
+    rng = np.random.default_rng(seed)
+    n_seq = max(1, pnl.shape[1] // 10)
+    idx = rng.integers(0, pnl.shape[1], size=(n_seq, n_trades))
+    equity = np.cumprod(1 + pnl[:, idx], axis=2)
+    ruined = np.min(equity, axis=2) <= 1 - ruin_threshold
+    return ruined.mean(axis=1)
+
+
+def analyze_risk(df, leverage, stop_loss_pct=0.01, take_profit_pct=0.015,
+                 leverage_grid=LEVERAGE_GRID, n_paths=N_PATHS, horizon=HORIZON, seed=None, side="long"):
+    leverages = np.union1d(leverage_grid, [leverage])
+    pnl, liquidated, stopped, tp_first = simulate_trade_outcomes(
+        df, leverages, stop_loss_pct, take_profit_pct, n_paths, horizon, seed, side)
+    ruin = risk_of_ruin(pnl, seed=seed)
+
+    grid = []
+    for i, lev in enumerate(leverages):
+        grid.append({
+            "leverage": int(lev),
+            "liquidation_prob": round(float(liquidated[i].mean()), 4),
+            "stop_loss_prob": round(float(stopped[i].mean()), 4),
+            "take_profit_prob": round(float(tp_first[i].mean()), 4),
+            "expected_return": round(float(pnl[i].mean()), 4),
+            "var_95": round(float(np.percentile(pnl[i], 5)), 4),
+            "risk_of_ruin": round(float(ruin[i]), 4),
+        })
+
+    safe = [row["leverage"] for row in grid
+            if row["risk_of_ruin"] <= MAX_RISK_OF_RUIN and row["liquidation_prob"] <= MAX_LIQUIDATION_PROB]
+    selected = next(row for row in grid if row["leverage"] == int(leverage))
+
+    # None یعنی هیچ اهرمی در شبکه (حتی 1x) از آستانه‌ها عبور نکرده است
+    return {
+        "recommended_leverage": max(safe) if safe else None,
+        "selected": selected,
+        "grid": grid,
+        "side": side,
+        "n_paths": n_paths,
+        "horizon": horizon,
+    }
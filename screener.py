@@ -0,0 +1,156 @@
+import heapq
+import threading
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from data_fetcher import DEFAULT_CANDLES, get_instruments, get_ohlcv, get_tickers
+from indicators import calculate_core_indicators, calculate_indicators
+from patterns import detect_patterns_and_pullbacks, detect_pullbacks
+from trend_analysis import analyze_trend
+from signal_generator import generate_signal
+from candle_buffer import TIMEFRAME_MS, CandleRing
+
+TOP_K = 10
+MAX_TOP_K = 50
+# همان تعداد کندلی که هاب و صفحه تحلیل استفاده می‌کنند تا امتیازها یکسان باشند
+SCREEN_CANDLES = DEFAULT_CANDLES
+MIN_QUOTE_VOLUME = 100000
+MAX_WORKERS = 8
+REQUESTS_PER_SECOND = 15
+
+
+class _RateLimiter:
+    # محدودیت درخواست OKX برای candles (حدود 20 درخواست در ثانیه برای هر IP)
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+# یک محدودکننده برای کل پروسه تا اسکن‌های هم‌زمان با هم از سقف OKX عبور نکنند
+_limiter = _RateLimiter(REQUESTS_PER_SECOND)
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def _reader(symbol, timeframe):
+    key = (symbol, timeframe)
+    with _readers_lock:
+        if key not in _readers:
+            try:
+                _readers[key] = CandleRing.attach(symbol, timeframe)
+            except FileNotFoundError:
+                return None
+        return _readers[key]
+
+
+def _cached_candles(symbol, timeframe, limit):
+    # اگر هاب این جفت را در بافر مشترک منتشر کرده و کندل آخر هنوز تازه است، از OKX نمی‌گیریم
+    ring = _reader(symbol, timeframe)
+    if ring is None:
+        return None
+    last_ts = ring.last_timestamp()
+    if len(ring) < limit or last_ts is None:
+        return None
+    if time.time() * 1000 - last_ts >= TIMEFRAME_MS.get(timeframe, 0):
+        return None
+    return ring.snapshot(limit)
+
+
+def _signal(df, patterns, pullbacks, trend_info):
+    return generate_signal(df, patterns, pullbacks, trend_info, capital=1, leverage=1)
+
+
+def _light_candidate(symbol, timeframe, limit, limiter):
+    df = _cached_candles(symbol, timeframe, limit)
+    cached = df is not None
+    if not cached:
+        limiter.wait()
+        df = get_ohlcv(symbol, timeframe, limit=limit)
+    df = calculate_core_indicators(df)
+    score = _signal(df, [], detect_pullbacks(df), analyze_trend(df))["prediction_accuracy"]
+    return score, symbol, df, cached
+
+
+def scan_market(timeframe="1m", top_k=TOP_K, quote="USDT", min_quote_volume=MIN_QUOTE_VOLUME,
+                limit=SCREEN_CANDLES):
+    started = time.perf_counter()
+    instruments = [inst["instId"] for inst in get_instruments("SPOT")
+                   if inst.get("quoteCcy") == quote]
+    tickers = get_tickers("SPOT")
+
+    # مرحله 1: حذف جفت‌های کم‌حجم فقط با یک درخواست tickers
+    liquid = [symbol for symbol in instruments
+              if symbol in tickers and float(tickers[symbol].get("volCcy24h") or 0) >= min_quote_volume]
+
+    # مرحله 2: اندیکاتورهای سبک (همان ستون‌هایی که امتیاز generate_signal به آن‌ها وابسته است)
+    candidates = []
+    failed = 0
+    cached = 0
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = [pool.submit(_light_candidate, symbol, timeframe, limit, _limiter)
+                   for symbol in liquid]
+        for future in futures:
+            try:
+                candidate = future.result()
+            except Exception:
+                failed += 1
+                continue
+            cached += candidate[3]
+            candidates.append(candidate[:3])
+    candidates.sort(key=lambda c: c[0], reverse=True)
+
+    # مرحله 3: calculate_indicators کامل فقط برای جفت‌هایی که هنوز می‌توانند وارد top-K شوند.
+    # ترتیب: امتیاز، سپس قدرت روند (ADX از اندیکاتورهای کامل)، سپس تعداد الگوها؛
+    # چون کاندیدها به ترتیب امتیاز هستند، اولین امتیاز کمتر از کمینه heap یعنی پایان
+    heap = []
+    full = 0
+    for order, (score, symbol, df) in enumerate(candidates):
+        if len(heap) == top_k and score < heap[0][0][0]:
+            break
+        df = calculate_indicators(df)
+        patterns, pullbacks = detect_patterns_and_pullbacks(df)
+        trend_info = analyze_trend(df)
+        signal = _signal(df, patterns, pullbacks, trend_info)
+        adx = df["adx"].iloc[-1]
+        adx = 0.0 if pd.isna(adx) else round(float(adx), 2)
+        key = (signal["prediction_accuracy"], adx, len(patterns))
+        full += 1
+        row = {
+            "symbol": symbol,
+            "score": signal["prediction_accuracy"],
+            "recommendation": signal["recommendation"],
+            "trend": trend_info["trend"],
+            "adx": adx,
+            "patterns": patterns,
+            "pullbacks": pullbacks,
+            "price": signal["entry_price"],
+            "quote_volume_24h": float(tickers[symbol].get("volCcy24h") or 0),
+        }
+        item = (key, -order, row)
+        if len(heap) < top_k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    results = [row for _, _, row in sorted(heap, key=lambda item: item[:2], reverse=True)]
+    stats = {
+        "instruments": len(instruments),
+        "liquid": len(liquid),
+        "light_scored": len(candidates),
+        "from_cache": cached,
+        "failed": failed,
+        "full_indicators": full,
+        "elapsed_s": round(time.perf_counter() - started, 2),
+    }
+    return {"results": results, "stats": stats}